@@ -16,6 +16,7 @@
 import logging
 from typing import (
     TYPE_CHECKING,
+    AbstractSet,
     Iterable,
     List,
     Mapping,
@@ -40,24 +41,36 @@ logger = logging.getLogger(__name__)
 
 
 @overload
-def parse_integer(request: Request, name: str, default: int) -> int:
+def parse_integer(
+    request: Request, name: str, default: int, *, negative: bool = True
+) -> int:
     ...
 
 
 @overload
-def parse_integer(request: Request, name: str, *, required: Literal[True]) -> int:
+def parse_integer(
+    request: Request, name: str, *, required: Literal[True], negative: bool = True
+) -> int:
     ...
 
 
 @overload
 def parse_integer(
-    request: Request, name: str, default: Optional[int] = None, required: bool = False
+    request: Request,
+    name: str,
+    default: Optional[int] = None,
+    required: bool = False,
+    negative: bool = True,
 ) -> Optional[int]:
     ...
 
 
 def parse_integer(
-    request: Request, name: str, default: Optional[int] = None, required: bool = False
+    request: Request,
+    name: str,
+    default: Optional[int] = None,
+    required: bool = False,
+    negative: bool = True,
 ) -> Optional[int]:
     """Parse an integer parameter from the request string
 
@@ -67,16 +80,18 @@ def parse_integer(
         default: value to use if the parameter is absent, defaults to None.
         required: whether to raise a 400 SynapseError if the parameter is absent,
             defaults to False.
+        negative: whether to allow negative integers, defaults to True.
 
     Returns:
         An int value or the default.
 
     Raises:
-        SynapseError: if the parameter is absent and required, or if the
-            parameter is present and not an integer.
+        SynapseError: if the parameter is absent and required, if the
+            parameter is present and not an integer, or if the
+            parameter is negative and `negative` is False.
     """
     args: Mapping[bytes, Sequence[bytes]] = request.args  # type: ignore
-    return parse_integer_from_args(args, name, default, required)
+    return parse_integer_from_args(args, name, default, required, negative)
 
 
 def parse_integer_from_args(
@@ -84,6 +99,7 @@ def parse_integer_from_args(
     name: str,
     default: Optional[int] = None,
     required: bool = False,
+    negative: bool = True,
 ) -> Optional[int]:
     """Parse an integer parameter from the request string
 
@@ -93,22 +109,30 @@ def parse_integer_from_args(
         default: value to use if the parameter is absent, defaults to None.
         required: whether to raise a 400 SynapseError if the parameter is absent,
             defaults to False.
+        negative: whether to allow negative integers, defaults to True.
 
     Returns:
         An int value or the default.
 
     Raises:
-        SynapseError: if the parameter is absent and required, or if the
-            parameter is present and not an integer.
+        SynapseError: if the parameter is absent and required, if the
+            parameter is present and not an integer, or if the
+            parameter is negative and `negative` is False.
     """
     name_bytes = name.encode("ascii")
 
     if name_bytes in args:
         try:
-            return int(args[name_bytes][0])
+            integer = int(args[name_bytes][0])
         except Exception:
             message = "Query parameter %r must be an integer" % (name,)
             raise SynapseError(400, message, errcode=Codes.INVALID_PARAM)
+
+        if not negative and integer < 0:
+            message = "Query parameter %s must be a positive integer." % (name,)
+            raise SynapseError(400, message, errcode=Codes.INVALID_PARAM)
+
+        return integer
     else:
         if required:
             message = "Missing integer query parameter %r" % (name,)
@@ -381,6 +405,9 @@ def _parse_string_value(
         raise SynapseError(400, "Query parameter %r must be %s" % (name, encoding))
 
     if allowed_values is not None and value_str not in allowed_values:
+        # Sets have no stable order, so sort them to keep the message consistent.
+        if isinstance(allowed_values, AbstractSet):
+            allowed_values = sorted(allowed_values)
         message = "Query parameter %r must be one of [%s]" % (
             name,
             ", ".join(repr(v) for v in allowed_values),
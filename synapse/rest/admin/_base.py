@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import re
-from typing import Iterable, Pattern
+from typing import Pattern, Tuple
 
 from synapse.api.auth import Auth
 from synapse.api.errors import AuthError
@@ -21,19 +22,22 @@ from synapse.http.site import SynapseRequest
 from synapse.types import UserID
 
 
-def admin_patterns(path_regex: str, version: str = "v1") -> Iterable[Pattern]:
-    """Returns the list of patterns for an admin endpoint
+@functools.lru_cache(maxsize=None)
+def admin_patterns(path_regex: str, version: str = "v1") -> Tuple[Pattern, ...]:
+    """Returns the patterns for an admin endpoint
+
+    The result is cached per `(path_regex, version)`, so servlets sharing a
+    path share the same compiled patterns.
 
     Args:
         path_regex: The regex string to match. This should NOT have a ^
             as this will be prefixed.
 
     Returns:
-        A list of regex patterns.
+        A tuple of regex patterns.
     """
     admin_prefix = "^/_synapse/admin/" + version
-    patterns = [re.compile(admin_prefix + path_regex)]
-    return patterns
+    return (re.compile(admin_prefix + path_regex),)
 
 
 async def assert_requester_is_admin(auth: Auth, request: SynapseRequest) -> None:
@@ -14,9 +14,11 @@
 # limitations under the License.
 
 import logging
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, FrozenSet, Optional, Tuple
 
-from synapse.api.errors import AuthError, Codes, NotFoundError, SynapseError
+import attr
+
+from synapse.api.errors import Codes, NotFoundError, SynapseError
 from synapse.http.server import HttpServer
 from synapse.http.servlet import RestServlet, parse_boolean, parse_integer, parse_string
 from synapse.http.site import SynapseRequest
@@ -33,17 +35,99 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Timestamps below this are rejected as they are very likely to have been given
+# in seconds rather than milliseconds: it is Dec 1970 in milliseconds, but
+# Aug 2920 in seconds.
+_MIN_BEFORE_TS_MS = 30000000000
+
+# The values accepted for the `order_by` parameter when listing or deleting a
+# user's media.
+_ORDER_BY_ALLOWED: FrozenSet[str] = frozenset(
+    {
+        MediaSortOrder.MEDIA_ID.value,
+        MediaSortOrder.UPLOAD_NAME.value,
+        MediaSortOrder.CREATED_TS.value,
+        MediaSortOrder.LAST_ACCESS_TS.value,
+        MediaSortOrder.MEDIA_LENGTH.value,
+        MediaSortOrder.MEDIA_TYPE.value,
+        MediaSortOrder.QUARANTINED_BY.value,
+        MediaSortOrder.SAFE_FROM_QUARANTINE.value,
+    }
+)
+
+
+@attr.s(slots=True, frozen=True, auto_attribs=True)
+class _Pagination:
+    """The pagination parameters of a user media request."""
+
+    # Offset into the user's media list, from the `from` parameter.
+    start: int
+    # Maximum number of media to return or delete.
+    limit: int
+
+
+def _parse_pagination(request: SynapseRequest) -> _Pagination:
+    """Parse the `from` and `limit` query parameters of a user media request.
+
+    Args:
+        request: the request being handled
+
+    Returns:
+        The parsed pagination parameters.
+
+    Raises:
+        SynapseError if either parameter is not a positive integer.
+    """
+    return _Pagination(
+        start=parse_integer(request, "from", default=0, negative=False),
+        limit=parse_integer(request, "limit", default=100, negative=False),
+    )
+
+
+# The query parameters which select the sort order of a user's media.
+_SORT_ARGS: FrozenSet[bytes] = frozenset({b"order_by", b"dir"})
+
+
+def _parse_media_order(request: SynapseRequest) -> Tuple[str, str]:
+    """Parse the `order_by` and `dir` query parameters of a user media request.
+
+    Args:
+        request: the request being handled
+
+    Returns:
+        A tuple of (order_by, direction).
+
+    Raises:
+        SynapseError if either parameter has a disallowed value.
+    """
+    # This will always be set by the time Twisted calls us.
+    args = request.args or {}
+
+    # If neither `order_by` nor `dir` is set, set the default order
+    # to newest media is on top for backward compatibility.
+    if args.keys().isdisjoint(_SORT_ARGS):
+        return MediaSortOrder.CREATED_TS.value, "b"
+
+    order_by = parse_string(
+        request,
+        "order_by",
+        default=MediaSortOrder.CREATED_TS.value,
+        allowed_values=_ORDER_BY_ALLOWED,
+    )
+    direction = parse_string(request, "dir", default="f", allowed_values=("f", "b"))
+    return order_by, direction
+
 
 class QuarantineMediaInRoom(RestServlet):
     """Quarantines all media in a room so that no one can download it via
     this server.
     """
 
-    PATTERNS = [
-        *admin_patterns("/room/(?P<room_id>[^/]+)/media/quarantine$"),
+    PATTERNS = (
+        admin_patterns("/room/(?P<room_id>[^/]+)/media/quarantine$")
         # This path kept around for legacy reasons
-        *admin_patterns("/quarantine_media/(?P<room_id>[^/]+)"),
-    ]
+        + admin_patterns("/quarantine_media/(?P<room_id>[^/]+)")
+    )
 
     def __init__(self, hs: "HomeServer"):
         self.store = hs.get_datastore()
@@ -55,7 +139,7 @@ class QuarantineMediaInRoom(RestServlet):
         requester = await self.auth.get_user_by_req(request)
         await assert_user_is_admin(self.auth, requester.user)
 
-        logging.info("Quarantining room: %s", room_id)
+        logger.info("Quarantining room: %s", room_id)
 
         # Quarantine all media in this room
         num_quarantined = await self.store.quarantine_media_ids_in_room(
@@ -82,7 +166,7 @@ class QuarantineMediaByUser(RestServlet):
         requester = await self.auth.get_user_by_req(request)
         await assert_user_is_admin(self.auth, requester.user)
 
-        logging.info("Quarantining local media by user: %s", user_id)
+        logger.info("Quarantining local media by user: %s", user_id)
 
         # Quarantine all media this user has uploaded
         num_quarantined = await self.store.quarantine_media_ids_by_user(
@@ -92,14 +176,14 @@ class QuarantineMediaByUser(RestServlet):
         return 200, {"num_quarantined": num_quarantined}
 
 
-class QuarantineMediaByID(RestServlet):
-    """Quarantines local or remote media by a given ID so that no one can download
-    it via this server.
+class _QuarantineMediaByIDBase(RestServlet):
+    """Base class for the servlets which add local or remote media to, or remove it
+    from, quarantine by ID.
+
+    Subclasses set `QUARANTINE` to choose which.
     """
 
-    PATTERNS = admin_patterns(
-        "/media/quarantine/(?P<server_name>[^/]+)/(?P<media_id>[^/]+)"
-    )
+    QUARANTINE: bool
 
     def __init__(self, hs: "HomeServer"):
         self.store = hs.get_datastore()
@@ -108,52 +192,54 @@ class QuarantineMediaByID(RestServlet):
     async def on_POST(
         self, request: SynapseRequest, server_name: str, media_id: str
     ) -> Tuple[int, JsonDict]:
-        requester = await self.auth.get_user_by_req(request)
-        await assert_user_is_admin(self.auth, requester.user)
+        if self.QUARANTINE:
+            requester = await self.auth.get_user_by_req(request)
+            await assert_user_is_admin(self.auth, requester.user)
 
-        logging.info("Quarantining local media by ID: %s/%s", server_name, media_id)
+            logger.info("Quarantining local media by ID: %s/%s", server_name, media_id)
+            quarantined_by: Optional[str] = requester.user.to_string()
+        else:
+            await assert_requester_is_admin(self.auth, request)
 
-        # Quarantine this media id
-        await self.store.quarantine_media_by_id(
-            server_name, media_id, requester.user.to_string()
-        )
+            logger.info(
+                "Remove from quarantine local media by ID: %s/%s", server_name, media_id
+            )
+            quarantined_by = None
+
+        # Quarantine, or remove from quarantine, this media id
+        await self.store.quarantine_media_by_id(server_name, media_id, quarantined_by)
 
         return 200, {}
 
 
-class UnquarantineMediaByID(RestServlet):
+class QuarantineMediaByID(_QuarantineMediaByIDBase):
     """Quarantines local or remote media by a given ID so that no one can download
     it via this server.
     """
 
     PATTERNS = admin_patterns(
-        "/media/unquarantine/(?P<server_name>[^/]+)/(?P<media_id>[^/]+)"
+        "/media/quarantine/(?P<server_name>[^/]+)/(?P<media_id>[^/]+)"
     )
+    QUARANTINE = True
 
-    def __init__(self, hs: "HomeServer"):
-        self.store = hs.get_datastore()
-        self.auth = hs.get_auth()
 
-    async def on_POST(
-        self, request: SynapseRequest, server_name: str, media_id: str
-    ) -> Tuple[int, JsonDict]:
-        requester = await self.auth.get_user_by_req(request)
-        await assert_user_is_admin(self.auth, requester.user)
+class UnquarantineMediaByID(_QuarantineMediaByIDBase):
+    """Removes local or remote media by a given ID from quarantine."""
 
-        logging.info(
-            "Remove from quarantine local media by ID: %s/%s", server_name, media_id
-        )
+    PATTERNS = admin_patterns(
+        "/media/unquarantine/(?P<server_name>[^/]+)/(?P<media_id>[^/]+)"
+    )
+    QUARANTINE = False
 
-        # Remove from quarantine this media id
-        await self.store.quarantine_media_by_id(server_name, media_id, None)
 
-        return 200, {}
+class _ProtectMediaByIDBase(RestServlet):
+    """Base class for the servlets which protect local media from being
+    quarantined, or unprotect it.
 
+    Subclasses set `SAFE` to choose which.
+    """
 
-class ProtectMediaByID(RestServlet):
-    """Protect local media from being quarantined."""
-
-    PATTERNS = admin_patterns("/media/protect/(?P<media_id>[^/]+)")
+    SAFE: bool
 
     def __init__(self, hs: "HomeServer"):
         self.store = hs.get_datastore()
@@ -162,38 +248,31 @@ class ProtectMediaByID(RestServlet):
     async def on_POST(
         self, request: SynapseRequest, media_id: str
     ) -> Tuple[int, JsonDict]:
-        requester = await self.auth.get_user_by_req(request)
-        await assert_user_is_admin(self.auth, requester.user)
+        await assert_requester_is_admin(self.auth, request)
 
-        logging.info("Protecting local media by ID: %s", media_id)
+        if self.SAFE:
+            logger.info("Protecting local media by ID: %s", media_id)
+        else:
+            logger.info("Unprotecting local media by ID: %s", media_id)
 
-        # Protect this media id
-        await self.store.mark_local_media_as_safe(media_id, safe=True)
+        # Protect or unprotect this media id
+        await self.store.mark_local_media_as_safe(media_id, safe=self.SAFE)
 
         return 200, {}
 
 
-class UnprotectMediaByID(RestServlet):
-    """Unprotect local media from being quarantined."""
-
-    PATTERNS = admin_patterns("/media/unprotect/(?P<media_id>[^/]+)")
-
-    def __init__(self, hs: "HomeServer"):
-        self.store = hs.get_datastore()
-        self.auth = hs.get_auth()
+class ProtectMediaByID(_ProtectMediaByIDBase):
+    """Protect local media from being quarantined."""
 
-    async def on_POST(
-        self, request: SynapseRequest, media_id: str
-    ) -> Tuple[int, JsonDict]:
-        requester = await self.auth.get_user_by_req(request)
-        await assert_user_is_admin(self.auth, requester.user)
+    PATTERNS = admin_patterns("/media/protect/(?P<media_id>[^/]+)")
+    SAFE = True
 
-        logging.info("Unprotecting local media by ID: %s", media_id)
 
-        # Unprotect this media id
-        await self.store.mark_local_media_as_safe(media_id, safe=False)
+class UnprotectMediaByID(_ProtectMediaByIDBase):
+    """Unprotect local media from being quarantined."""
 
-        return 200, {}
+    PATTERNS = admin_patterns("/media/unprotect/(?P<media_id>[^/]+)")
+    SAFE = False
 
 
 class ListMediaInRoom(RestServlet):
@@ -208,10 +287,7 @@ class ListMediaInRoom(RestServlet):
     async def on_GET(
         self, request: SynapseRequest, room_id: str
     ) -> Tuple[int, JsonDict]:
-        requester = await self.auth.get_user_by_req(request)
-        is_admin = await self.auth.is_server_admin(requester.user)
-        if not is_admin:
-            raise AuthError(403, "You are not a server admin")
+        await assert_requester_is_admin(self.auth, request)
 
         local_mxcs, remote_mxcs = await self.store.get_media_mxcs_in_room(room_id)
 
@@ -228,16 +304,10 @@ class PurgeMediaCacheRestServlet(RestServlet):
     async def on_POST(self, request: SynapseRequest) -> Tuple[int, JsonDict]:
         await assert_requester_is_admin(self.auth, request)
 
-        before_ts = parse_integer(request, "before_ts", required=True)
+        before_ts = parse_integer(request, "before_ts", required=True, negative=False)
         logger.info("before_ts: %r", before_ts)
 
-        if before_ts < 0:
-            raise SynapseError(
-                400,
-                "Query parameter before_ts must be a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
-        elif before_ts < 30000000000:  # Dec 1970 in milliseconds, Aug 2920 in seconds
+        if before_ts < _MIN_BEFORE_TS_MS:
             raise SynapseError(
                 400,
                 "Query parameter before_ts you provided is from the year 1970. "
@@ -269,10 +339,10 @@ class DeleteMediaByID(RestServlet):
         if self.server_name != server_name:
             raise SynapseError(400, "Can only delete local media")
 
-        if await self.store.get_local_media(media_id) is None:
+        if not await self.store.local_media_exists(media_id):
             raise NotFoundError("Unknown media")
 
-        logging.info("Deleting local media by ID: %s", media_id)
+        logger.info("Deleting local media by ID: %s", media_id)
 
         deleted_media, total = await self.media_repository.delete_local_media_ids(
             [media_id]
@@ -298,36 +368,26 @@ class DeleteMediaByDateSize(RestServlet):
     ) -> Tuple[int, JsonDict]:
         await assert_requester_is_admin(self.auth, request)
 
-        before_ts = parse_integer(request, "before_ts", required=True)
-        size_gt = parse_integer(request, "size_gt", default=0)
+        if self.server_name != server_name:
+            raise SynapseError(400, "Can only delete local media")
+
+        before_ts = parse_integer(request, "before_ts", required=True, negative=False)
+        size_gt = parse_integer(request, "size_gt", default=0, negative=False)
         keep_profiles = parse_boolean(request, "keep_profiles", default=True)
 
-        if before_ts < 0:
-            raise SynapseError(
-                400,
-                "Query parameter before_ts must be a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
-        elif before_ts < 30000000000:  # Dec 1970 in milliseconds, Aug 2920 in seconds
+        if before_ts < _MIN_BEFORE_TS_MS:
             raise SynapseError(
                 400,
                 "Query parameter before_ts you provided is from the year 1970. "
                 + "Double check that you are providing a timestamp in milliseconds.",
                 errcode=Codes.INVALID_PARAM,
             )
-        if size_gt < 0:
-            raise SynapseError(
-                400,
-                "Query parameter size_gt must be a string representing a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
 
-        if self.server_name != server_name:
-            raise SynapseError(400, "Can only delete local media")
-
-        logging.info(
-            "Deleting local media by timestamp: %s, size larger than: %s, keep profile media: %s"
-            % (before_ts, size_gt, keep_profiles)
+        logger.info(
+            "Deleting local media by timestamp: %s, size larger than: %s, keep profile media: %s",
+            before_ts,
+            size_gt,
+            keep_profiles,
         )
 
         deleted_media, total = await self.media_repository.delete_old_local_media(
@@ -360,14 +420,16 @@ class UserMediaRestServlet(RestServlet):
         self.store = hs.get_datastore()
         self.media_repository = hs.get_media_repository()
 
-    async def on_GET(
-        self, request: SynapseRequest, user_id: str
-    ) -> Tuple[int, JsonDict]:
-        # This will always be set by the time Twisted calls us.
-        assert request.args is not None
+    async def _check_local_user_exists(self, user_id: str) -> None:
+        """Check that the given user ID belongs to an existing local user.
 
-        await assert_requester_is_admin(self.auth, request)
+        Args:
+            user_id: the fully-qualified user ID from the request path
 
+        Raises:
+            SynapseError if the user ID is malformed or not local.
+            NotFoundError if the user does not exist.
+        """
         if not self.is_mine(UserID.from_string(user_id)):
             raise SynapseError(400, "Can only look up local users")
 
@@ -375,124 +437,74 @@ class UserMediaRestServlet(RestServlet):
         if user is None:
             raise NotFoundError("Unknown user")
 
-        start = parse_integer(request, "from", default=0)
-        limit = parse_integer(request, "limit", default=100)
+    async def on_GET(
+        self, request: SynapseRequest, user_id: str
+    ) -> Tuple[int, JsonDict]:
+        await assert_requester_is_admin(self.auth, request)
 
-        if start < 0:
-            raise SynapseError(
-                400,
-                "Query parameter from must be a string representing a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
+        await self._check_local_user_exists(user_id)
 
-        if limit < 0:
-            raise SynapseError(
-                400,
-                "Query parameter limit must be a string representing a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
-
-        # If neither `order_by` nor `dir` is set, set the default order
-        # to newest media is on top for backward compatibility.
-        if b"order_by" not in request.args and b"dir" not in request.args:
-            order_by = MediaSortOrder.CREATED_TS.value
-            direction = "b"
-        else:
-            order_by = parse_string(
-                request,
-                "order_by",
-                default=MediaSortOrder.CREATED_TS.value,
-                allowed_values=(
-                    MediaSortOrder.MEDIA_ID.value,
-                    MediaSortOrder.UPLOAD_NAME.value,
-                    MediaSortOrder.CREATED_TS.value,
-                    MediaSortOrder.LAST_ACCESS_TS.value,
-                    MediaSortOrder.MEDIA_LENGTH.value,
-                    MediaSortOrder.MEDIA_TYPE.value,
-                    MediaSortOrder.QUARANTINED_BY.value,
-                    MediaSortOrder.SAFE_FROM_QUARANTINE.value,
-                ),
-            )
-            direction = parse_string(
-                request, "dir", default="f", allowed_values=("f", "b")
-            )
+        pagination = _parse_pagination(request)
+        order_by, direction = _parse_media_order(request)
 
         media, total = await self.store.get_local_media_by_user_paginate(
-            start, limit, user_id, order_by, direction
+            pagination.start, pagination.limit, user_id, order_by, direction
         )
 
         ret = {"media": media, "total": total}
-        if (start + limit) < total:
-            ret["next_token"] = start + len(media)
+        if (pagination.start + pagination.limit) < total:
+            ret["next_token"] = pagination.start + len(media)
 
         return 200, ret
 
     async def on_DELETE(
         self, request: SynapseRequest, user_id: str
     ) -> Tuple[int, JsonDict]:
-        # This will always be set by the time Twisted calls us.
-        assert request.args is not None
-
         await assert_requester_is_admin(self.auth, request)
 
-        if not self.is_mine(UserID.from_string(user_id)):
-            raise SynapseError(400, "Can only look up local users")
-
-        user = await self.store.get_user_by_id(user_id)
-        if user is None:
-            raise NotFoundError("Unknown user")
+        await self._check_local_user_exists(user_id)
 
-        start = parse_integer(request, "from", default=0)
-        limit = parse_integer(request, "limit", default=100)
+        pagination = _parse_pagination(request)
+        order_by, direction = _parse_media_order(request)
 
-        if start < 0:
-            raise SynapseError(
-                400,
-                "Query parameter from must be a string representing a positive integer.",
-                errcode=Codes.INVALID_PARAM,
+        if parse_boolean(request, "all", default=False):
+            delete_id = self.media_repository.start_delete_all_local_media_by_user(
+                user_id
             )
+            return 200, {"delete_id": delete_id}
 
-        if limit < 0:
-            raise SynapseError(
-                400,
-                "Query parameter limit must be a string representing a positive integer.",
-                errcode=Codes.INVALID_PARAM,
-            )
+        (
+            deleted_media,
+            total,
+        ) = await self.media_repository.delete_local_media_by_user_paginate(
+            pagination.start, pagination.limit, user_id, order_by, direction
+        )
 
-        # If neither `order_by` nor `dir` is set, set the default order
-        # to newest media is on top for backward compatibility.
-        if b"order_by" not in request.args and b"dir" not in request.args:
-            order_by = MediaSortOrder.CREATED_TS.value
-            direction = "b"
-        else:
-            order_by = parse_string(
-                request,
-                "order_by",
-                default=MediaSortOrder.CREATED_TS.value,
-                allowed_values=(
-                    MediaSortOrder.MEDIA_ID.value,
-                    MediaSortOrder.UPLOAD_NAME.value,
-                    MediaSortOrder.CREATED_TS.value,
-                    MediaSortOrder.LAST_ACCESS_TS.value,
-                    MediaSortOrder.MEDIA_LENGTH.value,
-                    MediaSortOrder.MEDIA_TYPE.value,
-                    MediaSortOrder.QUARANTINED_BY.value,
-                    MediaSortOrder.SAFE_FROM_QUARANTINE.value,
-                ),
-            )
-            direction = parse_string(
-                request, "dir", default="f", allowed_values=("f", "b")
-            )
+        return 200, {"deleted_media": deleted_media, "total": total}
 
-        media, _ = await self.store.get_local_media_by_user_paginate(
-            start, limit, user_id, order_by, direction
-        )
 
-        deleted_media, total = await self.media_repository.delete_local_media_ids(
-            ([row["media_id"] for row in media])
-        )
+class DeleteUserMediaStatusRestServlet(RestServlet):
+    """
+    Gets the status of a deletion of all of a user's media, started by
+    `UserMediaRestServlet` with `all=true`.
+    """
 
-        return 200, {"deleted_media": deleted_media, "total": total}
+    PATTERNS = admin_patterns("/delete_user_media_status/(?P<delete_id>[^/]+)$")
+
+    def __init__(self, hs: "HomeServer"):
+        self.auth = hs.get_auth()
+        self.media_repository = hs.get_media_repository()
+
+    async def on_GET(
+        self, request: SynapseRequest, delete_id: str
+    ) -> Tuple[int, JsonDict]:
+        await assert_requester_is_admin(self.auth, request)
+
+        delete_status = self.media_repository.get_delete_user_media_status(delete_id)
+        if delete_status is None:
+            raise NotFoundError("delete id '%s' not found" % delete_id)
+
+        return 200, delete_status.asdict()
 
 
 def register_servlets_for_media_repo(hs: "HomeServer", http_server: HttpServer) -> None:
@@ -510,3 +522,4 @@ def register_servlets_for_media_repo(hs: "HomeServer", http_server: HttpServer)
     DeleteMediaByID(hs).register(http_server)
     DeleteMediaByDateSize(hs).register(http_server)
     UserMediaRestServlet(hs).register(http_server)
+    DeleteUserMediaStatusRestServlet(hs).register(http_server)
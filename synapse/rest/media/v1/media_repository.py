@@ -17,11 +17,14 @@ import logging
 import os
 import shutil
 from io import BytesIO
-from typing import IO, TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+from typing import IO, TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+import attr
 
 import twisted.internet.error
 import twisted.web.http
 from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
 from twisted.web.resource import Resource
 
 from synapse.api.errors import (
@@ -36,7 +39,8 @@ from synapse.config.repository import ThumbnailRequirement
 from synapse.http.site import SynapseRequest
 from synapse.logging.context import defer_to_thread
 from synapse.metrics.background_process_metrics import run_as_background_process
-from synapse.types import UserID
+from synapse.storage.databases.main.media_repository import MediaSortOrder
+from synapse.types import JsonDict, UserID
 from synapse.util.async_helpers import Linearizer
 from synapse.util.retryutils import NotRetryingDestination
 from synapse.util.stringutils import random_string
@@ -67,6 +71,41 @@ logger = logging.getLogger(__name__)
 
 UPDATE_RECENTLY_ACCESSED_TS = 60 * 1000
 
+# When deleting all of a user's media, the number of media IDs to fetch and
+# remove at a time.
+DELETE_USER_MEDIA_PAGE_SIZE = 1000
+
+
+@attr.s(slots=True, auto_attribs=True)
+class DeleteUserMediaStatus:
+    """Object tracking the status of a request to delete all of a user's media
+
+    This class contains information on the progress of the deletion, for
+    return by get_delete_user_media_status.
+    """
+
+    STATUS_ACTIVE = 0
+    STATUS_COMPLETE = 1
+    STATUS_FAILED = 2
+
+    STATUS_TEXT = {
+        STATUS_ACTIVE: "active",
+        STATUS_COMPLETE: "complete",
+        STATUS_FAILED: "failed",
+    }
+
+    # Tracks whether this request has completed. One of STATUS_{ACTIVE,COMPLETE,FAILED}.
+    status: int = STATUS_ACTIVE
+
+    # The number of media deleted so far.
+    total: int = 0
+
+    def asdict(self) -> JsonDict:
+        return {
+            "status": DeleteUserMediaStatus.STATUS_TEXT[self.status],
+            "total": self.total,
+        }
+
 
 class MediaRepository:
     def __init__(self, hs: "HomeServer"):
@@ -92,6 +131,12 @@ class MediaRepository:
         self.recently_accessed_remotes: Set[Tuple[str, str]] = set()
         self.recently_accessed_locals: Set[str] = set()
 
+        # map from delete id to DeleteUserMediaStatus
+        self._delete_user_media_by_id: Dict[str, DeleteUserMediaStatus] = {}
+
+        # the set of users whose media is currently being deleted
+        self._delete_user_media_in_progress_by_user: Set[str] = set()
+
         self.federation_domain_whitelist = (
             hs.config.federation.federation_domain_whitelist
         )
@@ -855,18 +900,139 @@ class MediaRepository:
         return {"deleted": deleted}
 
     async def delete_local_media_ids(
-        self, media_ids: List[str]
+        self, media_ids: Iterable[str]
+    ) -> Tuple[List[str], int]:
+        """
+        Delete the given local or remote media IDs from this server
+
+        Args:
+            media_ids: The media IDs to delete.
+        Returns:
+            A tuple of (list of deleted media IDs, total deleted media IDs).
+        """
+        return await self._remove_local_media_from_disk(media_ids)
+
+    async def delete_local_media_by_user_paginate(
+        self,
+        start: int,
+        limit: int,
+        user_id: str,
+        order_by: str,
+        direction: str,
     ) -> Tuple[List[str], int]:
         """
-        Delete the given local or remote media ID from this server
+        Delete a page of the local media uploaded by the given user.
 
         Args:
-            media_id: The media ID to delete.
+            start: offset in the list of the user's media
+            limit: maximum amount of media to delete
+            user_id: fully-qualified user id
+            order_by: the sort order used to select the page
+            direction: sort ascending or descending
         Returns:
             A tuple of (list of deleted media IDs, total deleted media IDs).
         """
+        media_ids = await self.store.get_local_media_ids_by_user_paginate(
+            start, limit, user_id, order_by, direction
+        )
         return await self._remove_local_media_from_disk(media_ids)
 
+    def start_delete_all_local_media_by_user(self, user_id: str) -> str:
+        """Start deleting all of the local media uploaded by a user.
+
+        Args:
+            user_id: fully-qualified user id
+
+        Returns:
+            unique ID for this deletion.
+        """
+        if user_id in self._delete_user_media_in_progress_by_user:
+            raise SynapseError(
+                400, "Media deletion already in progress for %s" % (user_id,)
+            )
+
+        delete_id = random_string(16)
+
+        # we log the delete_id here so that it can be tied back to the
+        # request id in the log lines.
+        logger.info(
+            "Starting delete_id %s of all local media uploaded by %s",
+            delete_id,
+            user_id,
+        )
+
+        self._delete_user_media_by_id[delete_id] = DeleteUserMediaStatus()
+        self._delete_user_media_in_progress_by_user.add(user_id)
+        run_as_background_process(
+            "delete_all_local_media_by_user",
+            self._delete_all_local_media_by_user,
+            delete_id,
+            user_id,
+        )
+        return delete_id
+
+    async def _delete_all_local_media_by_user(
+        self, delete_id: str, user_id: str
+    ) -> None:
+        """Delete all of the local media uploaded by a user, a page at a time.
+
+        Args:
+            delete_id: The id for this deletion
+            user_id: fully-qualified user id
+        """
+        delete_status = self._delete_user_media_by_id[delete_id]
+        try:
+            # Media whose file could not be removed is left in the database, so
+            # we skip past it when fetching the next page.
+            skipped = 0
+            while True:
+                media_ids = await self.store.get_local_media_ids_by_user_paginate(
+                    skipped,
+                    DELETE_USER_MEDIA_PAGE_SIZE,
+                    user_id,
+                    MediaSortOrder.MEDIA_ID.value,
+                    "f",
+                )
+                if not media_ids:
+                    break
+
+                _, num_deleted = await self._remove_local_media_from_disk(media_ids)
+                delete_status.total += num_deleted
+                skipped += len(media_ids) - num_deleted
+
+            logger.info(
+                "delete_id %s complete: deleted %d local media",
+                delete_id,
+                delete_status.total,
+            )
+            delete_status.status = DeleteUserMediaStatus.STATUS_COMPLETE
+        except Exception:
+            f = Failure()
+            logger.error(
+                "delete_id %s failed",
+                delete_id,
+                exc_info=(f.type, f.value, f.getTracebackObject()),  # type: ignore
+            )
+            delete_status.status = DeleteUserMediaStatus.STATUS_FAILED
+        finally:
+            self._delete_user_media_in_progress_by_user.discard(user_id)
+
+            # remove the status from the list 24 hours after it completes
+            def clear_delete() -> None:
+                del self._delete_user_media_by_id[delete_id]
+
+            self.hs.get_reactor().callLater(24 * 3600, clear_delete)
+
+    def get_delete_user_media_status(
+        self, delete_id: str
+    ) -> Optional[DeleteUserMediaStatus]:
+        """Get the current status of a deletion of all of a user's media
+
+        Args:
+            delete_id: delete_id returned by start_delete_all_local_media_by_user
+        """
+        return self._delete_user_media_by_id.get(delete_id)
+
     async def delete_old_local_media(
         self,
         before_ts: int,
@@ -895,14 +1061,17 @@ class MediaRepository:
         return await self._remove_local_media_from_disk(old_media)
 
     async def _remove_local_media_from_disk(
-        self, media_ids: List[str]
+        self, media_ids: Iterable[str]
     ) -> Tuple[List[str], int]:
         """
         Delete local or remote media from this server. Removes media files,
         any thumbnails and cached URLs.
 
+        The files are removed one by one, then the database entries for all of
+        the removed media are deleted in one batched transaction.
+
         Args:
-            media_ids: List of media_id to delete
+            media_ids: Iterable of media_id to delete
         Returns:
             A tuple of (list of deleted media IDs, total deleted media IDs).
         """
@@ -922,13 +1091,10 @@ class MediaRepository:
             thumbnail_dir = self.filepaths.local_media_thumbnail_dir(media_id)
             shutil.rmtree(thumbnail_dir, ignore_errors=True)
 
-            await self.store.delete_remote_media(self.server_name, media_id)
-
-            await self.store.delete_url_cache((media_id,))
-            await self.store.delete_url_cache_media((media_id,))
-
             removed_media.append(media_id)
 
+        await self.store.delete_local_media_entries(removed_media)
+
         return removed_media, len(removed_media)
 
 
@@ -13,10 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Collection, Dict, Iterable, List, Optional, Tuple
 
 from synapse.storage._base import SQLBaseStore
 from synapse.storage.database import DatabasePool
+from synapse.util.iterutils import batch_iter
 
 if TYPE_CHECKING:
     from synapse.server import HomeServer
@@ -45,6 +46,37 @@ class MediaSortOrder(Enum):
     SAFE_FROM_QUARANTINE = "safe_from_quarantine"
 
 
+def _user_media_page_clause(order_by: str, direction: str) -> str:
+    """Build the ORDER BY and LIMIT clauses which select a page of a user's
+    local media.
+
+    Every query which pages through a user's media must use this, so that the
+    same `start`, `limit`, `order_by` and `direction` always pick the same rows.
+
+    Args:
+        order_by: the sort order, a `MediaSortOrder` value
+        direction: "b" to sort descending, anything else to sort ascending
+    Returns:
+        The SQL clauses. They take the limit and the offset as parameters, in
+        that order.
+    """
+    # Set ordering
+    order_by_column = MediaSortOrder(order_by).value
+
+    if direction == "b":
+        order = "DESC"
+    else:
+        order = "ASC"
+
+    return """
+        ORDER BY {order_by_column} {order}, media_id ASC
+        LIMIT ? OFFSET ?
+    """.format(
+        order_by_column=order_by_column,
+        order=order,
+    )
+
+
 class MediaRepositoryBackgroundUpdateStore(SQLBaseStore):
     def __init__(self, database: DatabasePool, db_conn, hs: "HomeServer"):
         super().__init__(database, db_conn, hs)
@@ -152,6 +184,24 @@ class MediaRepositoryStore(MediaRepositoryBackgroundUpdateStore):
             desc="get_local_media",
         )
 
+    async def local_media_exists(self, media_id: str) -> bool:
+        """Check whether a local piece of media exists
+
+        Args:
+            media_id: the media ID to check
+
+        Returns:
+            True if the media is in the local media repository
+        """
+        result = await self.db_pool.simple_select_one_onecol(
+            table="local_media_repository",
+            keyvalues={"media_id": media_id},
+            retcol="1",
+            allow_none=True,
+            desc="local_media_exists",
+        )
+        return result is not None
+
     async def get_local_media_by_user_paginate(
         self,
         start: int,
@@ -175,15 +225,6 @@ class MediaRepositoryStore(MediaRepositoryBackgroundUpdateStore):
         """
 
         def get_local_media_by_user_paginate_txn(txn):
-
-            # Set ordering
-            order_by_column = MediaSortOrder(order_by).value
-
-            if direction == "b":
-                order = "DESC"
-            else:
-                order = "ASC"
-
             args = [user_id]
             sql = """
                 SELECT COUNT(*) as total_media
@@ -205,11 +246,8 @@ class MediaRepositoryStore(MediaRepositoryBackgroundUpdateStore):
                     "safe_from_quarantine"
                 FROM local_media_repository
                 WHERE user_id = ?
-                ORDER BY {order_by_column} {order}, media_id ASC
-                LIMIT ? OFFSET ?
-            """.format(
-                order_by_column=order_by_column,
-                order=order,
+            """ + _user_media_page_clause(
+                order_by, direction
             )
 
             args += [limit, start]
@@ -221,6 +259,46 @@ class MediaRepositoryStore(MediaRepositoryBackgroundUpdateStore):
             "get_local_media_by_user_paginate_txn", get_local_media_by_user_paginate_txn
         )
 
+    async def get_local_media_ids_by_user_paginate(
+        self,
+        start: int,
+        limit: int,
+        user_id: str,
+        order_by: str = MediaSortOrder.CREATED_TS.value,
+        direction: str = "f",
+    ) -> List[str]:
+        """Get a paginated list of the media IDs which an user_id has uploaded
+
+        This is the same page as `get_local_media_by_user_paginate` returns,
+        but without the other metadata columns or the total count.
+
+        Args:
+            start: offset in the list
+            limit: maximum amount of media_ids to retrieve
+            user_id: fully-qualified user id
+            order_by: the sort order of the returned list
+            direction: sort ascending or descending
+        Returns:
+            A paginated list of the user's media IDs
+        """
+
+        sql = """
+            SELECT media_id
+            FROM local_media_repository
+            WHERE user_id = ?
+        """ + _user_media_page_clause(
+            order_by, direction
+        )
+
+        def get_local_media_ids_by_user_paginate_txn(txn):
+            txn.execute(sql, (user_id, limit, start))
+            return [row[0] for row in txn]
+
+        return await self.db_pool.runInteraction(
+            "get_local_media_ids_by_user_paginate",
+            get_local_media_ids_by_user_paginate_txn,
+        )
+
     async def get_local_media_before(
         self,
         before_ts: int,
@@ -594,6 +672,45 @@ class MediaRepositoryStore(MediaRepositoryBackgroundUpdateStore):
             "delete_remote_media", delete_remote_media_txn
         )
 
+    async def delete_local_media_entries(self, media_ids: Collection[str]) -> None:
+        """Delete the database entries for the given local media, along with
+        their thumbnails and URL cache entries, in a single transaction.
+
+        Args:
+            media_ids: The media IDs to delete.
+        """
+        if not media_ids:
+            return
+
+        def _delete_local_media_entries_txn(txn):
+            # Delete in batches to keep the number of query parameters bounded,
+            # rather than issuing one DELETE per media ID.
+            for batch in batch_iter(media_ids, 500):
+                for table in ("remote_media_cache", "remote_media_cache_thumbnails"):
+                    self.db_pool.simple_delete_many_txn(
+                        txn,
+                        table=table,
+                        column="media_id",
+                        values=batch,
+                        keyvalues={"media_origin": self.server_name},
+                    )
+                for table in (
+                    "local_media_repository_url_cache",
+                    "local_media_repository",
+                    "local_media_repository_thumbnails",
+                ):
+                    self.db_pool.simple_delete_many_txn(
+                        txn,
+                        table=table,
+                        column="media_id",
+                        values=batch,
+                        keyvalues={},
+                    )
+
+        await self.db_pool.runInteraction(
+            "delete_local_media_entries", _delete_local_media_entries_txn
+        )
+
     async def get_expired_url_cache(self, now_ts: int) -> List[str]:
         sql = (
             "SELECT media_id FROM local_media_repository_url_cache"
@@ -897,34 +897,43 @@ class RoomWorkerStore(SQLBaseStore):
             The total number of media items quarantined
         """
 
-        # Update all the tables to set the quarantined_by flag
-        sql = """
-            UPDATE local_media_repository
-            SET quarantined_by = ?
-            WHERE media_id = ?
-        """
+        total_media_quarantined = 0
 
-        # set quarantine
-        if quarantined_by is not None:
-            sql += "AND safe_from_quarantine = ?"
-            rows = [(quarantined_by, media_id, False) for media_id in local_mxcs]
-        # remove from quarantine
-        else:
-            rows = [(quarantined_by, media_id) for media_id in local_mxcs]
+        # Update all the tables to set the quarantined_by flag. Each statement
+        # is only run if there is media for it, as quarantining a single media
+        # item only ever touches one of the tables.
+        if local_mxcs:
+            sql = """
+                UPDATE local_media_repository
+                SET quarantined_by = ?
+                WHERE media_id = ?
+            """
 
-        txn.executemany(sql, rows)
-        # Note that a rowcount of -1 can be used to indicate no rows were affected.
-        total_media_quarantined = txn.rowcount if txn.rowcount > 0 else 0
+            # set quarantine
+            if quarantined_by is not None:
+                sql += "AND safe_from_quarantine = ?"
+                rows = [(quarantined_by, media_id, False) for media_id in local_mxcs]
+            # remove from quarantine
+            else:
+                rows = [(quarantined_by, media_id) for media_id in local_mxcs]
 
-        txn.executemany(
-            """
-                UPDATE remote_media_cache
-                SET quarantined_by = ?
-                WHERE media_origin = ? AND media_id = ?
-            """,
-            ((quarantined_by, origin, media_id) for origin, media_id in remote_mxcs),
-        )
-        total_media_quarantined += txn.rowcount if txn.rowcount > 0 else 0
+            txn.executemany(sql, rows)
+            # Note that a rowcount of -1 can be used to indicate no rows were affected.
+            total_media_quarantined += txn.rowcount if txn.rowcount > 0 else 0
+
+        if remote_mxcs:
+            txn.executemany(
+                """
+                    UPDATE remote_media_cache
+                    SET quarantined_by = ?
+                    WHERE media_origin = ? AND media_id = ?
+                """,
+                (
+                    (quarantined_by, origin, media_id)
+                    for origin, media_id in remote_mxcs
+                ),
+            )
+            total_media_quarantined += txn.rowcount if txn.rowcount > 0 else 0
 
         return total_media_quarantined
 
@@ -17,8 +17,10 @@ from unittest.mock import Mock
 
 from synapse.api.errors import SynapseError
 from synapse.http.servlet import (
+    parse_integer_from_args,
     parse_json_object_from_request,
     parse_json_value_from_request,
+    parse_string_from_args,
 )
 
 from tests import unittest
@@ -76,3 +78,41 @@ class TestServletUtils(unittest.TestCase):
         # Test not an object
         with self.assertRaises(SynapseError):
             parse_json_object_from_request(make_request(b'["foo"]'))
+
+    def test_parse_integer(self):
+        """Basic tests for parse_integer_from_args."""
+        args = {b"a": [b"5"], b"b": [b"-5"], b"c": [b"foo"]}
+
+        self.assertEqual(parse_integer_from_args(args, "a"), 5)
+        self.assertEqual(parse_integer_from_args(args, "b"), -5)
+        self.assertEqual(parse_integer_from_args(args, "a", negative=False), 5)
+        self.assertEqual(parse_integer_from_args(args, "d", default=3), 3)
+
+        # Negative values can be rejected.
+        with self.assertRaises(SynapseError):
+            parse_integer_from_args(args, "b", negative=False)
+
+        # Not an integer.
+        with self.assertRaises(SynapseError):
+            parse_integer_from_args(args, "c")
+
+        # Missing but required.
+        with self.assertRaises(SynapseError):
+            parse_integer_from_args(args, "d", required=True)
+
+    def test_parse_string_allowed_values(self):
+        """Tests for parse_string_from_args with allowed values."""
+        args = {b"a": [b"foo"], b"b": [b"qux"]}
+
+        for allowed_values in (("foo", "bar"), frozenset({"foo", "bar"})):
+            self.assertEqual(
+                parse_string_from_args(args, "a", allowed_values=allowed_values),
+                "foo",
+            )
+
+        # The allowed values in the error are sorted when given as a set.
+        with self.assertRaises(SynapseError) as cm:
+            parse_string_from_args(args, "b", allowed_values=frozenset({"foo", "bar"}))
+        self.assertEqual(
+            cm.exception.msg, "Query parameter 'b' must be one of ['bar', 'foo']"
+        )
@@ -22,10 +22,13 @@ from unittest.mock import Mock, patch
 
 from parameterized import parameterized, parameterized_class
 
+from twisted.internet.defer import Deferred
+
 import synapse.rest.admin
 from synapse.api.constants import UserTypes
 from synapse.api.errors import Codes, HttpResponseException, ResourceLimitError
 from synapse.api.room_versions import RoomVersions
+from synapse.logging.context import make_deferred_yieldable
 from synapse.rest.client import devices, login, logout, profile, room, sync
 from synapse.rest.media.v1.filepath import MediaFilePaths
 from synapse.types import JsonDict, UserID
@@ -2714,15 +2717,19 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         login.register_servlets,
     ]
 
+    # User localparts must be the base58 encoding of 32 bytes.
+    admin_localpart = "AT7MMgHMVAvAni3ipu6X6HYs4gXPXJ1kS9sKrGPG1Jtw"
+    user_localpart = "LQVcTQajEfHFgC7dJeWJ6R3uBsqZrSdp9rTzv344p4A"
+
     def prepare(self, reactor, clock, hs):
         self.store = hs.get_datastore()
         self.media_repo = hs.get_media_repository_resource()
         self.filepaths = MediaFilePaths(hs.config.media.media_store_path)
 
-        self.admin_user = self.register_user("admin", "pass", admin=True)
-        self.admin_user_tok = self.login("admin", "pass")
+        self.admin_user = self.register_user(self.admin_localpart, "pass", admin=True)
+        self.admin_user_tok = self.login(self.admin_localpart, "pass")
 
-        self.other_user = self.register_user("user", "pass")
+        self.other_user = self.register_user(self.user_localpart, "pass")
         self.url = "/_synapse/admin/v1/users/%s/media" % urllib.parse.quote(
             self.other_user
         )
@@ -2738,7 +2745,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
     @parameterized.expand(["GET", "DELETE"])
     def test_requester_is_no_admin(self, method: str):
         """If the user is not a server admin, an error is returned."""
-        other_user_token = self.login("user", "pass")
+        other_user_token = self.login(self.user_localpart, "pass")
 
         channel = self.make_request(
             method,
@@ -2780,7 +2787,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing list of media with limit"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2799,7 +2806,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing delete of media with limit"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2816,7 +2823,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing list of media with a defined starting point (from)"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2835,7 +2842,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing delete of media with a defined starting point (from)"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2852,7 +2859,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing list of media with a defined starting point and limit"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2871,7 +2878,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Testing delete of media with a defined starting point and limit"""
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -2936,7 +2943,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """
 
         number_media = 20
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         #  `next_token` does not appear
@@ -3027,7 +3034,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Tests that a normal lookup for media is successful"""
 
         number_media = 5
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         self._create_media_for_user(other_user_tok, number_media)
 
         channel = self.make_request(
@@ -3046,7 +3053,7 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         """Tests that a normal delete of media is successful"""
 
         number_media = 5
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
         media_ids = self._create_media_for_user(other_user_tok, number_media)
 
         # Test if the file exists
@@ -3071,12 +3078,181 @@ class UserMediaRestTestCase(unittest.HomeserverTestCase):
         for local_path in local_paths:
             self.assertFalse(os.path.exists(local_path))
 
+    def test_delete_page_matches_list(self):
+        """Tests that a paginated delete removes the page which a list with
+        the same parameters returns
+        """
+
+        other_user_tok = self.login(self.user_localpart, "pass")
+        media_ids = self._create_media_for_user(other_user_tok, 5)
+
+        params = "?order_by=media_id&dir=b&from=1&limit=2"
+
+        channel = self.make_request(
+            "GET",
+            self.url + params,
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        listed_media = [m["media_id"] for m in channel.json_body["media"]]
+        self.assertEqual(listed_media, sorted(media_ids, reverse=True)[1:3])
+
+        channel = self.make_request(
+            "DELETE",
+            self.url + params,
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        self.assertEqual(2, channel.json_body["total"])
+        self.assertCountEqual(channel.json_body["deleted_media"], listed_media)
+
+        for media_id in media_ids:
+            local_path = self.filepaths.local_media_filepath(media_id)
+            self.assertEqual(media_id not in listed_media, os.path.exists(local_path))
+
+    def test_delete_all_media(self):
+        """Tests that all media is deleted with `all=true`, ignoring `limit`,
+        and that media of other users is kept
+        """
+
+        number_media = 5
+        other_user_tok = self.login(self.user_localpart, "pass")
+        media_ids = self._create_media_for_user(other_user_tok, number_media)
+
+        user2_localpart = "7UKaz8YaQLWE1mPuGYknTLRjPcoxfeMULSj7oHD6J67U"
+        self.register_user(user2_localpart, "pass")
+        user2_tok = self.login(user2_localpart, "pass")
+        user2_media_ids = self._create_media_for_user(user2_tok, 2)
+
+        channel = self.make_request(
+            "DELETE",
+            self.url + "?all=true&limit=2",
+            access_token=self.admin_user_tok,
+        )
+
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        delete_id = channel.json_body["delete_id"]
+
+        # The deletion runs in the background
+        self.pump()
+
+        channel = self.make_request(
+            "GET",
+            "/_synapse/admin/v1/delete_user_media_status/%s" % (delete_id,),
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        self.assertEqual(
+            {"status": "complete", "total": number_media}, channel.json_body
+        )
+
+        # Test if the files are deleted
+        for media_id in media_ids:
+            local_path = self.filepaths.local_media_filepath(media_id)
+            self.assertFalse(os.path.exists(local_path))
+
+        # Test if the files of the other user are kept
+        for media_id in user2_media_ids:
+            local_path = self.filepaths.local_media_filepath(media_id)
+            self.assertTrue(os.path.exists(local_path))
+
+        channel = self.make_request(
+            "GET",
+            self.url,
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        self.assertEqual(0, channel.json_body["total"])
+
+    def test_delete_all_media_in_progress(self):
+        """Tests that a second deletion of all of a user's media is rejected
+        while the first one is still running
+        """
+
+        # Stall the deletion when it first looks up the user's media
+        media_ids_d: "Deferred[List[str]]" = Deferred()
+
+        async def get_local_media_ids_by_user_paginate(*args) -> List[str]:
+            return await make_deferred_yieldable(media_ids_d)
+
+        with patch.object(
+            self.store,
+            "get_local_media_ids_by_user_paginate",
+            side_effect=get_local_media_ids_by_user_paginate,
+        ):
+            channel = self.make_request(
+                "DELETE",
+                self.url + "?all=true",
+                access_token=self.admin_user_tok,
+            )
+            self.assertEqual(200, channel.code, msg=channel.json_body)
+            delete_id = channel.json_body["delete_id"]
+
+            status_url = "/_synapse/admin/v1/delete_user_media_status/%s" % (delete_id,)
+            channel = self.make_request(
+                "GET",
+                status_url,
+                access_token=self.admin_user_tok,
+            )
+            self.assertEqual(200, channel.code, msg=channel.json_body)
+            self.assertEqual({"status": "active", "total": 0}, channel.json_body)
+
+            channel = self.make_request(
+                "DELETE",
+                self.url + "?all=true",
+                access_token=self.admin_user_tok,
+            )
+            self.assertEqual(400, channel.code, msg=channel.json_body)
+
+            media_ids_d.callback([])
+
+        channel = self.make_request(
+            "GET",
+            status_url,
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        self.assertEqual({"status": "complete", "total": 0}, channel.json_body)
+
+        # Once the first deletion has finished, another one can be started
+        channel = self.make_request(
+            "DELETE",
+            self.url + "?all=true",
+            access_token=self.admin_user_tok,
+        )
+        self.assertEqual(200, channel.code, msg=channel.json_body)
+        self.assertNotEqual(delete_id, channel.json_body["delete_id"])
+
+    def test_delete_all_media_invalid_parameter(self):
+        """Tests that the pagination parameters are still validated with
+        `all=true`
+        """
+        channel = self.make_request(
+            "DELETE",
+            self.url + "?all=true&limit=-5",
+            access_token=self.admin_user_tok,
+        )
+
+        self.assertEqual(400, channel.code, msg=channel.json_body)
+        self.assertEqual(Codes.INVALID_PARAM, channel.json_body["errcode"])
+
+    def test_delete_user_media_status_unknown(self):
+        """Tests that the status of an unknown deletion is not found"""
+        channel = self.make_request(
+            "GET",
+            "/_synapse/admin/v1/delete_user_media_status/unknown",
+            access_token=self.admin_user_tok,
+        )
+
+        self.assertEqual(404, channel.code, msg=channel.json_body)
+        self.assertEqual(Codes.NOT_FOUND, channel.json_body["errcode"])
+
     def test_order_by(self):
         """
         Testing order list with parameter `order_by`
         """
 
-        other_user_tok = self.login("user", "pass")
+        other_user_tok = self.login(self.user_localpart, "pass")
 
         # Resolution: 1×1, MIME type: image/png, Extension: png, Size: 67 B
         image_data1 = SMALL_PNG
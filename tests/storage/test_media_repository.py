@@ -0,0 +1,109 @@
+# Copyright 2021 The Matrix.org Foundation C.I.C.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from synapse.types import UserID
+
+from tests.unittest import HomeserverTestCase
+
+
+class MediaRepositoryStoreTestCase(HomeserverTestCase):
+    def prepare(self, reactor, clock, hs):
+        self.store = hs.get_datastore()
+        self.media_repo = hs.get_media_repository()
+
+        self.media_id = "GerZNDnDZVjsOtardLuwfIBg"
+        self.url = "https://example.com/"
+        self.other_origin = "other.example.com"
+
+    def _store_remote_media(self, origin: str) -> None:
+        """Store a remote media entry and a thumbnail of it for `self.media_id`"""
+        self.get_success(
+            self.store.store_cached_remote_media(
+                origin, self.media_id, "image/png", 67, 0, None, "abcdefg"
+            )
+        )
+        self.get_success(
+            self.store.store_remote_media_thumbnail(
+                origin, self.media_id, "hijklmn", 32, 32, "image/png", "crop", 10
+            )
+        )
+
+    def test_delete_local_media_ids(self):
+        """Tests that deleting local media removes its thumbnails and URL cache
+        entries, but keeps remote media with the same ID from other servers
+        """
+        self.get_success(
+            self.store.store_local_media(
+                self.media_id,
+                "image/png",
+                0,
+                None,
+                67,
+                UserID.from_string("@user:test"),
+            )
+        )
+        self.get_success(
+            self.store.store_local_thumbnail(
+                self.media_id, 32, 32, "image/png", "crop", 10
+            )
+        )
+        self.get_success(
+            self.store.store_url_cache(
+                self.url, 200, None, 1000, "{}", self.media_id, 0
+            )
+        )
+        self._store_remote_media(self.hs.hostname)
+        self._store_remote_media(self.other_origin)
+
+        deleted_media, total = self.get_success(
+            self.media_repo.delete_local_media_ids([self.media_id])
+        )
+        self.assertEqual([self.media_id], deleted_media)
+        self.assertEqual(1, total)
+
+        self.assertIsNone(self.get_success(self.store.get_local_media(self.media_id)))
+        self.assertEqual(
+            [], self.get_success(self.store.get_local_media_thumbnails(self.media_id))
+        )
+        self.assertIsNone(self.get_success(self.store.get_url_cache(self.url, 0)))
+
+        # Entries in the remote media tables for our own server are removed...
+        self.assertIsNone(
+            self.get_success(
+                self.store.get_cached_remote_media(self.hs.hostname, self.media_id)
+            )
+        )
+        self.assertEqual(
+            [],
+            self.get_success(
+                self.store.get_remote_media_thumbnails(self.hs.hostname, self.media_id)
+            ),
+        )
+
+        # ... but remote media from other servers is kept.
+        self.assertIsNotNone(
+            self.get_success(
+                self.store.get_cached_remote_media(self.other_origin, self.media_id)
+            )
+        )
+        self.assertEqual(
+            1,
+            len(
+                self.get_success(
+                    self.store.get_remote_media_thumbnails(
+                        self.other_origin, self.media_id
+                    )
+                )
+            ),
+        )